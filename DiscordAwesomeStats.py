@@ -11,10 +11,13 @@ from plotify import Plotify
 from yattag import Doc, indent
 
 from LogGetter import LogGetter
+from classes import Archive
+from classes import Database
 from classes import Logger
+from classes.OutputWriter import OutputWriter
 
 
-def write_indexes_html(server_channel_dict, output_path):
+def write_indexes_html(server_channel_dict, writer):
     for id_server, server in server_channel_dict.items():
         doc, tag, text = Doc().tagtext()
 
@@ -44,8 +47,7 @@ def write_indexes_html(server_channel_dict, output_path):
                                         text("#" + str(channel["Channel name"]))
 
         result = indent(doc.getvalue())
-        with open(output_path + str(id_server) + "/index.html", "w") as file:
-            file.write(result)
+        writer.write(str(id_server) + "/index.html", result)
 
     doc, tag, text = Doc().tagtext()
     with tag('html'):
@@ -72,10 +74,8 @@ def write_indexes_html(server_channel_dict, output_path):
                             with tag('h4'):
                                 with tag('a', href=str(id_server)):
                                     text(server["Server name"])
-    print(doc.getvalue())
     result = indent(doc.getvalue())
-    with open(output_path + "index.html", "w") as file:
-        file.write(result)
+    writer.write("index.html", result)
     return
 
 
@@ -94,7 +94,6 @@ class DiscordAwesomeStats(discord.Client):
             os.mkdir("chat_logs")
 
     async def on_ready(self):
-        print("HEY")
         return
 
 
@@ -107,15 +106,11 @@ class SummaryWriter(discord.Client):
 
     async def on_ready(self):
         for summary_to_be_writed in self.summaries:
-            print(1)
             for server in self.servers:
-                print(2)
                 if server.id == summary_to_be_writed[0]:
-                    print(3)
                     for channel in server.channels:
-                        print(4)
                         if channel.id == summary_to_be_writed[1]:
-                            print(5)
+                            Logger.progress("summary_sent", server_id=server.id, channel_id=channel.id)
                             await self.send_message(channel, summary_to_be_writed[2])
         await self.logout()
 
@@ -130,54 +125,64 @@ def main():
 
     with open(args.config_file, 'r') as file:
         config = yaml.load(file)
+    Logger.setup(on_stdout=True)
+    Database.configure(config)
 
     lg = LogGetter(config)
     lg.run(config["token"])
     with open("data/summary.json", 'w') as summary_file:
         json.dump(lg.summary, summary_file, indent=4)
+    Archive.apply_retention(config)
 
     summaries_to_be_writed = []
     server_channel_dict = {}
-    for channel in lg.summary:
-        print("Doing plots for %s #%s" % (channel["Server name"], channel["Channel name"]))
-        try:
-            plotify = Plotify(config["outputdir"], channel)
-        except Plotify.EmptyChannelException:
-            print("Skipping it cause it's empty.")
-        else:
-            plotify.plotify()
-#            plotify.write_standing_history_html()
-            plotify.write_all_plots_html()
-            plotify.write_channel_main_html()
-            for server_config in config["servers"]:
-                print(server_config)
-                print(channel)
-                if str(server_config["id"]) == str(channel["Server ID"]):
-                    serv_conf = server_config
-                    break
+    writer = OutputWriter(config["outputdir"], config.get("stagingdir"))
+    try:
+        for i, channel in enumerate(lg.summary):
+            # The summary is grouped by server, release the connection of the previous one
+            if i > 0 and lg.summary[i - 1]["Server ID"] != channel["Server ID"]:
+                Database.close_server(lg.summary[i - 1]["Server ID"])
+            Logger.progress("plots_start", server_id=channel["Server ID"], channel_id=channel["Channel ID"], channel=channel["Channel name"])
+            try:
+                plotify = Plotify(writer, channel)
+            except Plotify.EmptyChannelException:
+                Logger.progress("plots_skipped_empty", server_id=channel["Server ID"], channel_id=channel["Channel ID"])
             else:
-                serv_conf = None
-
-            if not (args.silent or ("silent" in serv_conf and serv_conf["silent"])) \
-               and (("report_all" in serv_conf and serv_conf["report_all"]) or ("report" in serv_conf and channel["Channel ID"] in str(serv_conf["report"]))) \
-               and hasattr(plotify, "top10yesterday"):
-                text = "DiscoLog Awesome Stats has been updated.\n\nMessage amount 'til now: **%d**\nStandings of yesterday:\n```\n" % channel["Length"]
-                text += plotify.top10yesterday
-                text += "```\n\nMore stats and graphs here : https://dasfranck.fr/DiscordAwesomeStats/%s/%s/" % (channel["Server ID"], channel["Channel ID"])
-                summaries_to_be_writed.append((channel["Server ID"], channel["Channel ID"], text))
-        if (channel["Server ID"] not in server_channel_dict):
-            server_channel_dict[channel["Server ID"]] = {
-                "Server name": channel["Server name"],
-                "Channels": [{
+                plotify.plotify()
+#                plotify.write_standing_history_html()
+                plotify.write_all_plots_html()
+                plotify.write_channel_main_html()
+                for server_config in config["servers"]:
+                    if str(server_config["id"]) == str(channel["Server ID"]):
+                        serv_conf = server_config
+                        break
+                else:
+                    serv_conf = None
+
+                if not (args.silent or ("silent" in serv_conf and serv_conf["silent"])) \
+                   and (("report_all" in serv_conf and serv_conf["report_all"]) or ("report" in serv_conf and channel["Channel ID"] in str(serv_conf["report"]))) \
+                   and hasattr(plotify, "top10yesterday"):
+                    text = "DiscoLog Awesome Stats has been updated.\n\nMessage amount 'til now: **%d**\nStandings of yesterday:\n```\n" % channel["Length"]
+                    text += plotify.top10yesterday
+                    text += "```\n\nMore stats and graphs here : https://dasfranck.fr/DiscordAwesomeStats/%s/%s/" % (channel["Server ID"], channel["Channel ID"])
+                    summaries_to_be_writed.append((channel["Server ID"], channel["Channel ID"], text))
+            if (channel["Server ID"] not in server_channel_dict):
+                server_channel_dict[channel["Server ID"]] = {
+                    "Server name": channel["Server name"],
+                    "Channels": [{
+                        "Channel name": channel["Channel name"],
+                        "Channel ID": channel["Channel ID"]
+                    }]}
+            else:
+                server_channel_dict[channel["Server ID"]]["Channels"].append({
                     "Channel name": channel["Channel name"],
                     "Channel ID": channel["Channel ID"]
-                }]}
-        else:
-            server_channel_dict[channel["Server ID"]]["Channels"].append({
-                "Channel name": channel["Channel name"],
-                "Channel ID": channel["Channel ID"]
-            })
-    write_indexes_html(server_channel_dict, config["outputdir"])
+                })
+        write_indexes_html(server_channel_dict, writer)
+        writer.publish()
+    finally:
+        writer.discard()
+        Database.close_all()
 
     sw = SummaryWriter(config, summaries_to_be_writed)
     sw.run(config["token"])
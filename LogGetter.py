@@ -3,13 +3,12 @@
 
 from datetime import datetime
 import asyncio
-import os
-import sqlite3
 import sys
 import time
 
 import discord
 
+from classes import Database
 from classes import Logger
 
 
@@ -18,16 +17,14 @@ class LogGetter(discord.Client):
         super().__init__()
         self.logger = Logger.Logger()
         self.config = config
-        if not (os.path.exists("data")):
-            os.makedirs("data")
-        self.db = sqlite3.connect('data/database.db')
 
     async def on_ready(self):
         await self.get_server_messages()
         await self.logout()
 
     async def get_members_from_server(self, server):
-        cursor = self.db.cursor()
+        db = Database.get_writer(server.id)
+        cursor = db.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS 'members_%s'(
                 id INTEGER PRIMARY KEY ON CONFLICT REPLACE UNIQUE,
@@ -53,12 +50,13 @@ class LogGetter(discord.Client):
             )
             VALUES(?, ?, ?, ?)
             """ % server.id, members)
-        self.db.commit()
+        db.commit()
 
     async def get_logs_from_channel(self, channel, cfg):
-        print("\t{} ({})".format(channel.name, channel.id))
+        Logger.progress("channel_start", server_id=cfg["id"], channel_id=channel.id, channel=channel.name)
 
-        cursor = self.db.cursor()
+        db = Database.get_writer(cfg["id"])
+        cursor = db.cursor()
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS 'log_%s-%s'(
                 id INTEGER PRIMARY KEY ON CONFLICT REPLACE UNIQUE,
@@ -85,7 +83,7 @@ class LogGetter(discord.Client):
                 item.content
             ))
             if (len(log_buffer) % 1000 == 0):
-                print("\t\t%d" % len(log_buffer))
+                Logger.progress("channel_fetching", server_id=cfg["id"], channel_id=channel.id, fetched=len(log_buffer))
 
         cursor.executemany("""
             INSERT INTO 'log_%s-%s'(
@@ -93,7 +91,7 @@ class LogGetter(discord.Client):
             )
             VALUES(?, ?, ?, ?)
             """ % (str(cfg["id"]), channel.id), log_buffer)
-        self.db.commit()
+        db.commit()
 
         cursor.execute("select count(*) from 'log_%s-%s'" % (str(cfg["id"]), channel.id))
         msg_count = cursor.fetchone()[0]
@@ -114,13 +112,12 @@ class LogGetter(discord.Client):
             "Length": msg_count
         })
 
-        print("\t\t%d" % msg_count)
+        Logger.progress("channel_done", server_id=cfg["id"], channel_id=channel.id, fetched=len(log_buffer), total=msg_count)
 
     # Launch the getter when the bot is ready
     async def get_server_messages(self):
         self.summary = []
 
-        print("Sucessfully connected as %s (%s)\n" % (self.user.name, self.user.id))
         self.logger.logger.info("Sucessfully connected as %s (%s)" % (self.user.name, self.user.id))
         self.logger.logger.info("------------")
 
@@ -128,7 +125,7 @@ class LogGetter(discord.Client):
         for cfg in self.config["servers"]:
             for server in self.servers:
                 if server.id == str(cfg["id"]):
-                    print("{} ({})".format(server.name, server.id))
+                    Logger.progress("server_start", server_id=server.id, server=server.name)
                     await self.get_members_from_server(server)
                     for channel in server.channels:
                         if (channel.type != discord.ChannelType.voice and
@@ -137,9 +134,8 @@ class LogGetter(discord.Client):
                             try:
                                 await self.get_logs_from_channel(channel, cfg)
                             except discord.errors.Forbidden:
-                                pass
-                    print()
-        print("Done.")
+                                Logger.progress("channel_forbidden", server_id=server.id, channel_id=channel.id)
+                    Database.close_server(server.id)
         self.logger.logger.info("Done.")
         self.logger.logger.info("#--------------END--------------#")
         return self.summary
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cold archive of message contents.
+Contents older than the retention_days of a server are moved out of the
+log tables into gzipped, append-only JSON lines segments
+(data/archive/<server id>/<channel id>/<first message id>-<archive time>.jsonl.gz).
+Rows stay in the database with a NULL content, so the stats are unchanged.
+"""
+
+import gzip
+import json
+import os
+import time
+
+from classes import Database
+from classes import Logger
+
+
+ARCHIVE_PATH = "data/archive/"
+
+# Rows rewritten by each repack transaction
+REPACK_BATCH = 10000
+
+# Pages freed by each incremental_vacuum step, and maximum number of steps per run
+COMPACT_STEP = 4096
+COMPACT_MAX_STEPS = 64
+
+
+def channel_archive_path(server_id, channel_id):
+    return "{}{}/{}/".format(ARCHIVE_PATH, server_id, channel_id)
+
+
+def log_tables(db, server_id):
+    prefix = "log_{}-".format(server_id)
+    return [(name, name[len(prefix):]) for name, _ in Database.server_tables(db, server_id)
+            if name.startswith(prefix)]
+
+
+# Move the contents older than cutoff (timestamp) in a new segment, return the archived message count
+def archive_channel(db, server_id, channel_id, cutoff):
+    archive_dir = channel_archive_path(server_id, channel_id)
+    if not (os.path.exists(archive_dir)):
+        os.makedirs(archive_dir)
+
+    cursor = db.cursor()
+    cursor.execute("SELECT id, author_id, time, content FROM 'log_{}-{}' WHERE time < ? AND content IS NOT NULL ORDER BY id".format(server_id, channel_id),
+                   (cutoff,))
+
+    first_id = last_id = None
+    count = 0
+    tmp_path = archive_dir + ".segment.tmp"
+    with open(tmp_path, "wb") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8") as segment:
+            for row in cursor:
+                if first_id is None:
+                    first_id = row[0]
+                last_id = row[0]
+                segment.write(json.dumps(row) + "\n")
+                count += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    if count == 0:
+        os.remove(tmp_path)
+        return 0
+
+    # Contents are only dropped once the segment is safely on disk
+    os.replace(tmp_path, "{}{}-{}.jsonl.gz".format(archive_dir, first_id, int(time.time())))
+    # The rename itself must be durable too, or a crash could lose the segment
+    dir_fd = os.open(archive_dir, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+    cursor.execute("UPDATE 'log_{}-{}' SET content = NULL WHERE time < ? AND id >= ? AND id <= ?".format(server_id, channel_id),
+                   (cutoff, first_id, last_id))
+    db.commit()
+    repack(db, server_id, channel_id, first_id, last_id)
+    return count
+
+
+# Emptied contents leave holes inside the pages without freeing any of them.
+# Rewriting the rows of the archived id range packs them, by batches of REPACK_BATCH rows,
+# and the emptied pages go to the freelist for compact().
+def repack(db, server_id, channel_id, first_id, last_id):
+    cursor = db.cursor()
+    start = first_id
+    while True:
+        rows = cursor.execute("SELECT id, author_id, time, content FROM 'log_{}-{}' WHERE id >= ? AND id <= ? ORDER BY id LIMIT ?".format(server_id, channel_id),
+                              (start, last_id, REPACK_BATCH)).fetchall()
+        if not rows:
+            break
+        cursor.execute("DELETE FROM 'log_{}-{}' WHERE id >= ? AND id <= ?".format(server_id, channel_id),
+                       (rows[0][0], rows[-1][0]))
+        cursor.executemany("INSERT INTO 'log_{}-{}'(id, author_id, time, content) VALUES(?, ?, ?, ?)".format(server_id, channel_id),
+                           rows)
+        db.commit()
+        if len(rows) < REPACK_BATCH:
+            break
+        start = rows[-1][0] + 1
+
+
+# Stream back the archived (id, author_id, time, content) of a channel, ordered by segment
+def iter_archived_messages(server_id, channel_id):
+    archive_dir = channel_archive_path(server_id, channel_id)
+    if not (os.path.exists(archive_dir)):
+        return
+
+    segments = sorted((filename for filename in os.listdir(archive_dir) if filename.endswith(".jsonl.gz")),
+                      key=lambda filename: [int(part) for part in filename.split(".")[0].split("-")])
+    for filename in segments:
+        with gzip.open(archive_dir + filename, "rt", encoding="utf-8") as segment:
+            for line in segment:
+                yield tuple(json.loads(line))
+
+
+# Give the pages freed by the archived contents back to the filesystem, a bounded amount per run
+def compact(db, full_vacuum=False):
+    if db.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        if not full_vacuum:
+            Logger.logger.warning("Database without incremental auto_vacuum, its freed pages are kept. "
+                                  "Set archive_full_vacuum in the config to convert it with a full VACUUM "
+                                  "(needs as much free disk space as the database size).")
+            return
+        db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        db.execute("VACUUM")
+        return
+
+    for _ in range(COMPACT_MAX_STEPS):
+        if db.execute("PRAGMA freelist_count").fetchone()[0] == 0:
+            break
+        # execute() only steps the pragma once, which frees a single page
+        db.executescript("PRAGMA incremental_vacuum({});".format(COMPACT_STEP))
+
+
+def apply_retention(config):
+    for cfg in config["servers"]:
+        # Servers which have never been fetched have nothing to archive, don't create their database
+        if "retention_days" not in cfg or not os.path.exists(Database.database_path(cfg["id"])):
+            continue
+
+        cutoff = int(time.time()) - int(cfg["retention_days"]) * 86400
+        db = Database.get_writer(cfg["id"])
+
+        archived = 0
+        for _, channel_id in log_tables(db, cfg["id"]):
+            count = archive_channel(db, cfg["id"], channel_id, cutoff)
+            if count:
+                Logger.progress("channel_archived", server_id=cfg["id"], channel_id=channel_id, archived=count)
+            archived += count
+        # Pages left free by the step limit of previous runs are released as well
+        if archived or db.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+            compact(db, full_vacuum=config.get("archive_full_vacuum", False))
+        Database.close_server(cfg["id"])
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared SQLite access layer.
+The writer connection switches the database to WAL mode, so the read-only
+connections used for rendering can run while logs are still being ingested.
+When sharding is enabled in the config, every server gets its own database
+file and multi-server queries ATTACH the shards they need.
+"""
+
+import os
+import sqlite3
+
+
+DATABASE_PATH = "data/database.db"
+SHARDS_PATH = "data/shards/"
+
+# Number of compiled statements kept by each connection
+STATEMENT_CACHE_SIZE = 512
+
+# Default SQLITE_MAX_ATTACHED of the SQLite builds
+SQLITE_MAX_ATTACHED = 10
+
+PRAGMAS = (
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -131072",      # 128 MiB
+    "PRAGMA mmap_size = 1073741824",    # 1 GiB
+)
+
+sharded = False
+writers = {}
+readers = {}
+
+
+def configure(config):
+    global sharded
+    sharded = bool(config.get("sharded_database", False))
+
+
+# Path of the database file holding the tables of a server
+def database_path(server_id=None):
+    if sharded and server_id is not None:
+        return "{}{}.db".format(SHARDS_PATH, server_id)
+    return DATABASE_PATH
+
+
+# Schema name under which a shard is attached by attach_shards()
+def shard_schema(server_id):
+    return "shard_{}".format(server_id)
+
+
+def server_tables(connection, server_id, schema="main"):
+    cursor = connection.execute("SELECT name, sql FROM \"{}\".sqlite_master WHERE type = 'table'".format(schema))
+    return [(name, sql) for name, sql in cursor.fetchall()
+            if name == "members_{}".format(server_id) or name.startswith("log_{}-".format(server_id))]
+
+
+def tune(connection):
+    for pragma in PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+
+def connect(server_id=None):
+    path = database_path(server_id)
+    directory = os.path.dirname(path)
+    if directory and not (os.path.exists(directory)):
+        os.makedirs(directory)
+
+    # URI mode is needed to ATTACH other databases read-only
+    connection = sqlite3.connect("file:{}".format(path), uri=True, cached_statements=STATEMENT_CACHE_SIZE)
+    # Only effective on new databases, see Archive.compact() for the existing ones
+    connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    connection.execute("PRAGMA journal_mode = WAL")
+    return tune(connection)
+
+
+def connect_read_only(server_id=None):
+    connection = sqlite3.connect("file:{}?mode=ro".format(database_path(server_id)), uri=True,
+                                 cached_statements=STATEMENT_CACHE_SIZE)
+    connection.execute("PRAGMA query_only = ON")
+    return tune(connection)
+
+
+# Writer connection shared by every ingester of the process, one per database file
+def get_writer(server_id=None):
+    path = database_path(server_id)
+    if path not in writers:
+        writers[path] = connect(server_id)
+    return writers[path]
+
+
+# Read-only connection shared by every renderer of the process, one per database file
+def get_reader(server_id=None):
+    path = database_path(server_id)
+    if path not in readers:
+        readers[path] = connect_read_only(server_id)
+    return readers[path]
+
+
+# Close the connections of a server once its pass is done, they are reopened when needed again
+def close_server(server_id=None):
+    path = database_path(server_id)
+    for connections in (writers, readers):
+        if path in connections:
+            connections.pop(path).close()
+
+
+def close_all():
+    for connection in list(writers.values()) + list(readers.values()):
+        connection.close()
+    writers.clear()
+    readers.clear()
+
+
+# Attach the shards of the given servers to a connection, read-only.
+# Tables of a server are then reachable as "shard_<id>"."<table>".
+# In monolithic mode nothing is attached and every server lives in "main".
+# Servers without a shard file are left out of the returned mapping.
+def attach_shards(connection, server_ids):
+    if not sharded:
+        return {server_id: "main" for server_id in server_ids}
+
+    attached = [row[1] for row in connection.execute("PRAGMA database_list").fetchall()]
+    to_attach = [server_id for server_id in server_ids
+                 if shard_schema(server_id) not in attached and os.path.exists(database_path(server_id))]
+    already_attached = [name for name in attached if name not in ("main", "temp")]
+    if len(already_attached) + len(to_attach) > SQLITE_MAX_ATTACHED:
+        raise ValueError("Can't attach more than {} shards to a connection, use connect_servers()".format(SQLITE_MAX_ATTACHED))
+
+    schemas = {}
+    for server_id in server_ids:
+        schema = shard_schema(server_id)
+        if server_id in to_attach:
+            connection.execute("ATTACH DATABASE ? AS \"{}\"".format(schema),
+                               ("file:{}?mode=ro".format(database_path(server_id)),))
+        elif schema not in attached:
+            continue
+        schemas[server_id] = schema
+    return schemas
+
+
+# Connections to query several servers at once.
+# Yields (connection, server -> schema mapping) for batches of at most SQLITE_MAX_ATTACHED servers,
+# each connection is closed when the next batch is requested.
+def connect_servers(server_ids):
+    if not sharded:
+        connection = connect_read_only()
+        try:
+            yield connection, attach_shards(connection, server_ids)
+        finally:
+            connection.close()
+        return
+
+    server_ids = [server_id for server_id in server_ids if os.path.exists(database_path(server_id))]
+    for i in range(0, len(server_ids), SQLITE_MAX_ATTACHED):
+        connection = tune(sqlite3.connect("file::memory:", uri=True, cached_statements=STATEMENT_CACHE_SIZE))
+        try:
+            yield connection, attach_shards(connection, server_ids[i:i + SQLITE_MAX_ATTACHED])
+        finally:
+            connection.close()
+
+
+# Copy the tables of a server from the monolithic database into its shard.
+# The monolithic database is left untouched, remove it once the shards are checked.
+def split_server(server_id):
+    if not sharded:
+        raise RuntimeError("sharded_database must be enabled to split the database")
+
+    # Servers without any table don't get a shard
+    monolith = connect_read_only()
+    has_tables = len(server_tables(monolith, server_id)) > 0
+    monolith.close()
+    if not has_tables:
+        return []
+
+    connection = get_writer(server_id)
+    connection.execute("ATTACH DATABASE ? AS monolith", ("file:{}?mode=ro".format(DATABASE_PATH),))
+    try:
+        existing = [name for name, _ in server_tables(connection, server_id)]
+        copied = []
+        for name, sql in server_tables(connection, server_id, schema="monolith"):
+            if name not in existing:
+                connection.execute(sql)
+            connection.execute("INSERT OR REPLACE INTO main.\"{0}\" SELECT * FROM monolith.\"{0}\"".format(name))
+            connection.commit()
+            copied.append(name)
+    finally:
+        connection.rollback()
+        connection.execute("DETACH DATABASE monolith")
+    return copied
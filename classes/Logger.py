@@ -2,36 +2,70 @@
 # -*- coding: utf-8 -*-
 
 """
-Nothing here for now.
+Process-wide logging.
+Handlers are configured once, records are handed through a queue to a
+background thread which does the actual writing, so the asyncio loop never
+waits on the log file.
 """
 
+import atexit
 import logging
+import logging.handlers
 import os
+import queue
+import sys
 
+logger = logging.getLogger('discord')
+listener = None
+on_stdout_enabled = False
 
-class Logger():
-    logger = logging.getLogger('discord')
 
-    # Logger Initialization
-    def __init__(self, on_stdout=False, logging_type=logging.INFO):
-        # Set logger level to INFO
-        self.logger.setLevel(logging.INFO)
+# Configure the 'discord' logger, only the first call of the process does something
+def setup(on_stdout=False, logging_type=logging.INFO):
+    global listener, on_stdout_enabled
+    if listener is not None:
+        return
+
+    logger.setLevel(logging_type)
+
+    if not (os.path.exists("logs")):
+        os.makedirs("logs")
+
+    # Setting handler (Log File)
+    handler = logging.FileHandler(filename='logs/discord.log', encoding='utf-8', mode='a')
+    handler.setFormatter(logging.Formatter("%(asctime)s :: %(levelname)s :: %(message)s"))
+    handlers = [handler]
 
-        if not (os.path.exists("logs")):
-            os.makedirs("logs")
+    # Setting stream_handler (Stdout)
+    if (on_stdout):
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setLevel(logging.INFO)
+        # Records of the discord.py loggers (discord.client, discord.gateway...) only go to the log file
+        stream_handler.addFilter(lambda record: record.name == 'discord')
+        handlers.append(stream_handler)
+    on_stdout_enabled = on_stdout
 
-        # Setting handler (Log File)
-        handler = logging.FileHandler(filename='logs/discord.log', encoding='utf-8', mode='a')
-        handler.setFormatter(logging.Formatter("%(asctime)s :: %(levelname)s :: %(message)s"))
-        self.logger.addHandler(handler)
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
 
-        # Setting stream_handler (Stdout)
-        if (on_stdout):
-            stream_handler = logging.StreamHandler()
-            stream_handler.setLevel(logging.INFO)
-            self.logger.addHandler(stream_handler)
+    logger.info("#-------------START-------------#")
 
-        self.logger.info("#-------------START-------------#")
+
+# Structured progress record, the fields are kept on the record as record.progress
+def progress(event, **fields):
+    message = " ".join([event] + ["{}={}".format(key, value) for key, value in fields.items()])
+    logger.info(message, extra={"progress": dict(fields, event=event)})
+
+
+class Logger():
+    logger = logger
+
+    # Logger Initialization
+    def __init__(self, on_stdout=False, logging_type=logging.INFO):
+        setup(on_stdout, logging_type)
         return
 
     # Add an entry in the log with info level.
@@ -49,18 +83,22 @@ class Logger():
 
     def log_warn_command(self, string, message):
         if (message.channel.is_private is True):
-            self.logger.warn(string + " in a Private Channel")
+            self.logger.warning(string + " in a Private Channel")
         else:
-            self.logger.warn(string + " in #" + message.channel.name + " on " + message.server.name + " (%s)" % message.server.id)
+            self.logger.warning(string + " in #" + message.channel.name + " on " + message.server.name + " (%s)" % message.server.id)
 
+    # The stdout handler already prints the record when it is enabled
     def log_info_print(self, string):
         self.logger.info(string)
-        print(string)
+        if not on_stdout_enabled:
+            print(string)
 
     def log_warn_print(self, string):
-        self.logger.warn(string)
-        print(string)
+        self.logger.warning(string)
+        if not on_stdout_enabled:
+            print(string)
 
     def log_error_print(self, string):
         self.logger.error(string)
-        print(string)
+        if not on_stdout_enabled:
+            print(string)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Staged writer for the html output tree.
+Every page is first written in a staging directory (next to the output directory by default),
+then precompressed (.gz and .br) and published with atomic renames, so readers
+never see half-written files and static servers can serve the compressed siblings.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import os
+import shutil
+import tempfile
+
+import brotli
+
+
+COMPRESSED_EXTENSIONS = (".html", ".json")
+
+
+def compress_file(path):
+    with open(path, "rb") as file:
+        content = file.read()
+
+    siblings = [(path + ".gz", gzip.compress(content, compresslevel=9, mtime=0)),
+                (path + ".br", brotli.compress(content, quality=11))]
+
+    for sibling_path, compressed in siblings:
+        with open(sibling_path, "wb") as file:
+            file.write(compressed)
+    return [sibling_path for sibling_path, _ in siblings]
+
+
+class OutputWriter():
+    # staging_dir must be on the same filesystem as output_path to allow os.replace
+    def __init__(self, output_path, staging_dir=None):
+        self.output_path = output_path
+        if not (os.path.exists(self.output_path)):
+            os.makedirs(self.output_path)
+        if staging_dir is None:
+            staging_dir = os.path.dirname(os.path.normpath(self.output_path))
+        elif not (os.path.exists(staging_dir)):
+            os.makedirs(staging_dir)
+        self.staging_path = tempfile.mkdtemp(prefix=".{}-staging-".format(os.path.basename(os.path.normpath(self.output_path))),
+                                             dir=staging_dir)
+
+    # Return the staging path of a file of the output tree, creating its directory
+    def path(self, relative_path):
+        staged_path = os.path.join(self.staging_path, relative_path)
+        staged_dir = os.path.dirname(staged_path)
+        if not (os.path.exists(staged_dir)):
+            os.makedirs(staged_dir)
+        return staged_path
+
+    def write(self, relative_path, content):
+        with open(self.path(relative_path), "w", encoding="utf-8") as file:
+            file.write(content)
+
+    def publish(self, workers=None):
+        staged_files = []
+        for dirpath, _, filenames in os.walk(self.staging_path):
+            for filename in filenames:
+                staged_files.append(os.path.join(dirpath, filename))
+
+        to_compress = [path for path in staged_files if path.endswith(COMPRESSED_EXTENSIONS)]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for siblings in executor.map(compress_file, to_compress):
+                staged_files.extend(siblings)
+
+        # Compressed siblings are published before the page they belong to
+        staged_files.sort(key=lambda path: not path.endswith((".gz", ".br")))
+        for staged_path in staged_files:
+            final_path = os.path.join(self.output_path, os.path.relpath(staged_path, self.staging_path))
+            final_dir = os.path.dirname(final_path)
+            if not (os.path.exists(final_dir)):
+                os.makedirs(final_dir)
+            os.replace(staged_path, final_path)
+
+        self.discard()
+
+    # Drop whatever has not been published, safe to call after publish()
+    def discard(self):
+        shutil.rmtree(self.staging_path, ignore_errors=True)
@@ -7,14 +7,15 @@ import argparse
 import html
 import itertools
 import operator
-import os
-import sqlite3
 import pytz
 
 import plotly
 import plotly.graph_objs as go
 from yattag import Doc, indent
 
+from classes import Database
+from classes import Logger
+
 # Now use a sqlite database instead of plain text
 # Optimizations
 # Bugfixs
@@ -41,13 +42,12 @@ class Plotify():
     class EmptyChannelException(Exception):
         pass
 
-    def __init__(self, output_path, summary_dict):
+    def __init__(self, writer, summary_dict):
         self.summary = summary_dict
-        self.plots_dir = "{}/{}/{}/".format(output_path, self.summary["Server ID"], self.summary["Channel ID"])
+        self.writer = writer
+        self.plots_dir = "{}/{}/".format(self.summary["Server ID"], self.summary["Channel ID"])
 
-        if not (os.path.exists("data")):
-            os.makedirs("data")
-        self.db = sqlite3.connect('data/database.db')
+        self.db = Database.get_reader(self.summary["Server ID"])
 
         cursor = self.db.cursor()
         cursor.execute("SELECT COUNT(*) FROM 'log_{}-{}'".format(self.summary["Server ID"], self.summary["Channel ID"]))
@@ -58,8 +58,6 @@ class Plotify():
         self.get_date_array()
         self.counts = [self.get_count_per_date(date) for date in self.date_array]
         self.cumul = list(cumultative_sum(self.counts))
-        if not (os.path.exists(self.plots_dir)):
-            os.makedirs(self.plots_dir)
 
     def get_date_array(self):
         cursor = self.db.cursor()
@@ -90,7 +88,7 @@ class Plotify():
             cursor.execute("SELECT COUNT(*) FROM 'log_{}-{}' WHERE time >= ? AND time < ?".format(self.summary["Server ID"], self.summary["Channel ID"]),
                            (int(day_begin.timestamp()), int(day_end.timestamp())))
         else:
-            cursor.execute("SELECT COUNT(*) FROM 'log_{}-{}' WHERE time >= ? AND time < ? AND author_id LIKE (?)".format(self.summary["Server ID"], self.summary["Channel ID"]),
+            cursor.execute("SELECT COUNT(*) FROM 'log_{}-{}' WHERE time >= ? AND time < ? AND author_id = ?".format(self.summary["Server ID"], self.summary["Channel ID"]),
                            (int(day_begin.timestamp()), int(day_end.timestamp()), user))
         return cursor.fetchone()[0]
 
@@ -173,8 +171,7 @@ class Plotify():
                                 text("Page generated at %s by DiscoLog (DasFranck#1168)" % datetime.now().strftime("%T the %F"))
 
         result = indent(doc.getvalue())
-        with open(self.plots_dir + "index.html", "w") as file:
-            file.write(result)
+        self.writer.write(self.plots_dir + "index.html", result)
 
     def write_all_plots_html(self):
         doc, tag, text = Doc().tagtext()
@@ -189,8 +186,7 @@ class Plotify():
                 text("Page generated at %s" % datetime.now().strftime("%T the %F"))
 
         result = doc.getvalue()
-        with open(self.plots_dir + "allplots.html", "w") as file:
-            file.write(result)
+        self.writer.write(self.plots_dir + "allplots.html", result)
 
     def write_standing_history_html(self):
         doc, tag, text = Doc().tagtext()
@@ -205,8 +201,7 @@ class Plotify():
                 text("Page generated at %s" % datetime.now().strftime("%T the %F"))
 
         result = doc.getvalue()
-        with open(self.plots_dir + "standinghistory.html", "w") as file:
-            file.write(result)
+        self.writer.write(self.plots_dir + "standinghistory.html", result)
 
     def write_raw_text_in_html(self, content, path):
         doc, tag, text = Doc().tagtext()
@@ -218,8 +213,7 @@ class Plotify():
                 doc.asis(content)
 
         result = doc.getvalue()
-        with open(self.plots_dir + path, "w") as file:
-            file.write(result)
+        self.writer.write(self.plots_dir + path, result)
 
     def plot_msgperday(self, path):
         msg_average = []
@@ -236,12 +230,12 @@ class Plotify():
 
         return (generate_plot({"data": [line1, line2],
                                "layout": go.Layout(title="Number of messages per day in #%s (%s)" % (self.summary["Channel name"], self.summary["Server name"]))},
-                              self.plots_dir + path))
+                              self.writer.path(self.plots_dir + path)))
 
     def plot_msgcumul(self, path):
         return (generate_plot({"data": [go.Scatter(x=self.date_array, y=self.cumul)],
                                "layout": go.Layout(title="Number of cumulatives messages in #%s (%s)" % (self.summary["Channel name"], self.summary["Server name"]))},
-                              self.plots_dir + path))
+                              self.writer.path(self.plots_dir + path)))
 
     def plot_usertopx(self, max, path):
         cursor = self.db.cursor()
@@ -249,16 +243,14 @@ class Plotify():
 
         top = Counter(elem[0] for elem in cursor.fetchall()).most_common(max)
         top_users_ids = [elem[0] for elem in top]
-        print(top)
-        print(top_users_ids)
         users_line = []
         for i, user_id in enumerate(top_users_ids):
-            print(i + 1)
+            Logger.logger.debug("Top %d plot: user %d/%d (%s)" % (max, i + 1, len(top_users_ids), user_id))
 
             counts = [self.get_count_per_date(date, user=user_id) for date in self.date_array]
             cumul = list(cumultative_sum(counts))
 
-            cursor.execute("SELECT name, nick FROM members_{} WHERE id LIKE '{}';".format(self.summary["Server ID"], user_id))
+            cursor.execute("SELECT name, nick FROM members_{} WHERE id = ?;".format(self.summary["Server ID"]), (user_id,))
             user = cursor.fetchone()
             if not user:
                 user = ("UNKNOWN ({})".format(user_id), None)
@@ -269,7 +261,7 @@ class Plotify():
             users_line.append(line)
         return (generate_plot({"data": users_line,
                                "layout": go.Layout(title="Number of cumulatives messages for the Top %d users in #%s (%s)" % (max, self.summary["Channel name"], self.summary["Server name"]))},
-                              self.plots_dir + path))
+                              self.writer.path(self.plots_dir + path)))
 
     def top10_per_day(self, path):
         # user_list = sort(list(set(([b for a,b in meta_list]))))
@@ -315,14 +307,12 @@ class Plotify():
             plain = "No message has been posted in this channel yesterday"
             return (standing)
 
-        print(top)
         for (i, elem) in enumerate(top):
-            cursor.execute("SELECT name, nick FROM members_{} WHERE id LIKE '{}';".format(self.summary["Server ID"], elem[0]))
+            cursor.execute("SELECT name, nick FROM members_{} WHERE id = ?;".format(self.summary["Server ID"]), (elem[0],))
             user_names = cursor.fetchone()
             user_name = user_names[1] if user_names[1] else user_names[0]
             standing.append((user_name, elem[1]))
             plain += "{}.\t{}\t{}\n".format(i + 1, elem[1], user_name)
-        print(plain)
         self.top10yesterday = plain
         return (standing)
 
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import sys
+import yaml
+
+from classes import Database
+
+
+# Compare the row count of every copied table between the shards and data/database.db
+def check_shards(server_ids):
+    monolith = Database.connect_read_only()
+    mismatches = []
+    for connection, schemas in Database.connect_servers(server_ids):
+        for server_id, schema in schemas.items():
+            for name, _ in Database.server_tables(connection, server_id, schema=schema):
+                shard_count = connection.execute("SELECT COUNT(*) FROM \"{}\".\"{}\"".format(schema, name)).fetchone()[0]
+                monolith_count = monolith.execute("SELECT COUNT(*) FROM \"{}\"".format(name)).fetchone()[0]
+                if shard_count != monolith_count:
+                    mismatches.append((server_id, name, monolith_count, shard_count))
+    monolith.close()
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split data/database.db in one database per server")
+    parser.add_argument("config_file", default="./config.yaml")
+    args = parser.parse_args()
+
+    with open(args.config_file, 'r') as file:
+        config = yaml.load(file)
+    config["sharded_database"] = True
+    Database.configure(config)
+
+    server_ids = [cfg["id"] for cfg in config["servers"]]
+    for cfg in config["servers"]:
+        print("{} ({})".format(cfg["name"], cfg["id"]))
+        for table in Database.split_server(cfg["id"]):
+            print("\t{}".format(table))
+        Database.close_server(cfg["id"])
+
+    mismatches = check_shards(server_ids)
+    for server_id, name, monolith_count, shard_count in mismatches:
+        print("Mismatch in {} ({}): {} rows in {}, {} in the shard".format(name, server_id, monolith_count, Database.DATABASE_PATH, shard_count))
+    if mismatches:
+        return 1
+    print("Done. %s can be removed once the shards have been checked." % Database.DATABASE_PATH)
+
+
+if __name__ == '__main__':
+    sys.exit(main())